@@ -1,29 +1,76 @@
+import argparse
+import atexit
 import csv
+import io
 import os
+import re
+import shutil
 import subprocess
-import tkinter as tk
-from tkinter import filedialog
+import sys
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+
+# exiftool fields read by modify_row, in the order it unpacks them
+EXPORT_FIELDNAMES = ("SourceFile", "Title", "FileName", "FileCreateDate", "PageCount",
+                     "FileTypeExtension", "MIMEType", "LayerCount")
+
+# Buffer size for CSV files, so large exports are read and written in few system calls
+IO_BUFFER_SIZE = 1 << 20
+
+# Columns of metadata1.csv, in the order modify_row returns them
+METADATA_FIELDNAMES = ("filename", "dc.title", "dc.date", "dc.format", "dc.format2", "dc.description")
+
+# Columns of rights.csv
+RIGHTS_FIELDNAMES = ("file", "basis", "status", "determination_date", "jurisdiction", "start_date", "end_date",
+                     "note", "grant_act", "grant_restriction", "grant_start_date", "grant_end_date",
+                     "grant_note", "doc_id_type", "doc_id_value", "doc_id_role")
+
+# Map the doc_id_type prompt answer to the corresponding rights.csv value
+DOC_ID_TYPES = {
+    "d": "Deed of Gift",
+    "u": "University Records Transfer"
+}
+
+# Accession number format expected for doc_id_value (####-###)
+DOC_ID_RE = re.compile(r'^\d{4}-\d{3}$')
+
+# Extensions described as photographs rather than by page count
+PHOTO_EXTS = frozenset(("psd", "jpg", "jpeg", "tif", "tiff", "png"))
+
+# Hidden Tk root shared by the folder dialogs, created on first use
+_ROOT = None
+
+def _destroy_root():
+    if _ROOT is not None:
+        _ROOT.destroy()
 
 def select_folder_dialog(title="Select folder"):
-    root = tk.Tk()
-    root.withdraw()
-    folder_selected = filedialog.askdirectory(title=title)
-    root.destroy()
-    return folder_selected
+    """
+    Ask for a folder with a Tk dialog. tkinter is imported here rather than at module load, so runs that
+    skip the dialogs (answering n, or passing --source and --dest) neither load it nor need it installed.
+    """
+    global _ROOT
+    import tkinter as tk
+    from tkinter import filedialog
 
+    if _ROOT is None:
+        _ROOT = tk.Tk()
+        _ROOT.withdraw()
+        atexit.register(_destroy_root)
+    return filedialog.askdirectory(parent=_ROOT, title=title)
+
+@lru_cache(maxsize=1)
 def find_exiftool_executable():
     """
     Try to find an exiftool executable. Prefer 'exiftool' on PATH, otherwise fall back to common Windows path.
-    Returns the executable path or raises FileNotFoundError.
+    Returns the executable path or raises FileNotFoundError. The result is cached for the run.
     """
-    # First try simple name (works if in PATH)
+    # First try simple name (works if in PATH); a PATH lookup avoids starting exiftool just to probe it
     for candidate in ("exiftool", "exiftool.exe"):
-        try:
-            subprocess.run([candidate, "-ver"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-            return candidate
-        except Exception:
-            pass
+        path = shutil.which(candidate)
+        if path:
+            return path
 
     # Common Windows install location
     win_path = r"C:\Windows\exiftool.exe"
@@ -36,6 +83,11 @@ def run_exiftool_and_create_metadataexp(dest_folder, source_folder, output_name=
     """
     Run exiftool on source_folder recursively and write a CSV to dest_folder/output_name.
     Fields selected mirror the fields expected by the rest of this script.
+    exiftool's output is parsed as it arrives and written with the add_missing_columns and
+    remove_filemodify_if_both_exist fixes already applied, so neither needs to rewrite the file afterwards.
+    Raises CalledProcessError (after writing what exiftool produced) if exiftool exits with an error.
+    Bytes that are not UTF-8 (e.g. file names in the Windows code page) are written through unchanged, so
+    metadataExp.csv still holds everything exiftool reported and can be corrected by hand.
     """
     try:
         exiftool = find_exiftool_executable()
@@ -50,17 +102,33 @@ def run_exiftool_and_create_metadataexp(dest_folder, source_folder, output_name=
         "-FileTypeExtension", "-MIMEType", "-LayerCount",
         "*"
     ]
-    # Run exiftool with cwd=source_folder and capture stdout to the file
-    with open(output_csv, "w", encoding="utf-8", newline='') as outfile:
-        subprocess.run(args, cwd=source_folder, stdout=outfile, check=True)
+    # Run exiftool with cwd=source_folder and rewrite its stdout into the file as it is produced.
+    # surrogateescape on both sides passes undecodable bytes through as they were.
+    with open(output_csv, "w", encoding="utf-8", errors="surrogateescape", newline='',
+              buffering=IO_BUFFER_SIZE) as outfile:
+        proc = subprocess.Popen(args, cwd=source_folder, stdout=subprocess.PIPE)
+        try:
+            with io.TextIOWrapper(proc.stdout, encoding="utf-8", errors="surrogateescape", newline='') as exif_output:
+                copy_normalized_export(csv.reader(exif_output), csv.writer(outfile))
+        except BaseException:
+            # Don't leave exiftool running, or blocked writing to a pipe nobody reads
+            proc.kill()
+            raise
+        finally:
+            returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, args)
     return output_csv
 
-def convert_colons_to_hyphens(date):
-    return date.replace(':', '-')
-
-def remove_text_from_date(date):
-    return date.split()[0]
+def clean_date(date):
+    """
+    Turn an exiftool date such as "2004:03:01 10:00:00-05:00" into "2004-03-01":
+    keep the first whitespace-separated word and swap colons for hyphens. An empty date stays empty.
+    """
+    parts = date.split(None, 1)
+    return parts[0].replace(':', '-') if parts else ''
 
+@lru_cache(maxsize=4096)
 def add_page_count_extension(page_count, extension):
     """
     - If extension is a photographic type, return "1 photograph ({extension})"
@@ -68,11 +136,10 @@ def add_page_count_extension(page_count, extension):
     - Else return "{page_count} p. ({extension})"
     """
     extension = (extension or "").lower()
-    photo_exts = ["psd", "jpg", "jpeg", "tif", "tiff", "png"]
-    if extension in photo_exts:
+    if extension in PHOTO_EXTS:
         return f"1 photograph ({extension})"
     # No page count provided
-    if not page_count or str(page_count).strip() == "":
+    if not page_count or not page_count.strip():
         return f"1 digital file ({extension})" if extension else "1 digital file"
     # Otherwise use the page count
     return f"{page_count} p. ({extension})" if extension else f"{page_count} p."
@@ -80,17 +147,25 @@ def add_page_count_extension(page_count, extension):
 def add_data_objects_prefix(source_file):
     return "data/objects/" + source_file
 
+def strip_extension(name):
+    """
+    Return name without its last extension, as os.path.splitext does: leading dots (".bashrc") are not
+    treated as an extension.
+    """
+    i = name.rfind('.')
+    return name[:i] if i > 0 and name[:i].strip('.') else name
+
 def process_layer_count(layer_count, extension, title, filename):
     """
     - If layer_count is numeric: increment and report as Photoshop file with X layers (as before)
     - Otherwise: return "Item is a ({extension}) file relating to {label}"
       where label is Title (if present) else FileName (without its extension).
     """
-    # Normalize inputs
+    # Normalize inputs, stripping each once
     layer_count_str = str(layer_count or "")
     extension = extension or ""
-    title = title or ""
-    filename = filename or ""
+    title = (title or "").strip()
+    filename = (filename or "").strip()
 
     # If numeric, keep previous behavior (report number of layers + 1)
     if layer_count_str.isdigit():
@@ -103,329 +178,362 @@ def process_layer_count(layer_count, extension, title, filename):
 
     # Not numeric: build the "relating to" label from Title or FileName (without extension)
     label = ""
-    if title.strip() and title.strip().upper() != "NULL":
-        label = title.strip()
-    elif filename.strip():
-        # Use basename then strip extension
-        base = os.path.basename(filename.strip())
-        label = os.path.splitext(base)[0]
+    if title and title.upper() != "NULL":
+        label = title
+    elif filename:
+        # Use basename then strip extension; exiftool paths always use '/'
+        label = strip_extension(filename.rpartition('/')[2])
     else:
         label = ""
 
     if extension:
-        return f"Item is a {extension} file relating to {label}" if label else f"Item is a {extension} file."
+        return f"Item is a ({extension}) file relating to {label}" if label else f"Item is a ({extension}) file."
     else:
         return f"Item is a file relating to {label}" if label else "Item is a file."
 
-def modify_row(row):
-    # defensive: if keys missing, ensure defaults to empty strings
-    row['FileCreateDate'] = row.get('FileCreateDate', '')
-    row['FileCreateDate'] = convert_colons_to_hyphens(row['FileCreateDate'])
-    row['FileCreateDate'] = remove_text_from_date(row['FileCreateDate'])
-    row['SourceFile'] = add_data_objects_prefix(row.get('SourceFile', ''))
-    row['PageCount'] = add_page_count_extension(row.get('PageCount', ''), row.get('FileTypeExtension', ''))
-    # pass extension, Title and FileName to process_layer_count so it can produce the requested phrasing
-    row['LayerCount'] = process_layer_count(row.get('LayerCount', ''), row.get('FileTypeExtension', ''), row.get('Title', ''), row.get('FileName', ''))
-    return row
-
-def delete_columns(row):
-    # Use .pop with default to avoid KeyError if missing
-    row.pop("Title", None)
-    row.pop("FileTypeExtension", None)
-    return row
-
-def rename_columns(row):
-    column_mapping = {
-        "SourceFile": "filename",
-        "FileName": "dc.title",
-        "FileCreateDate": "dc.date",
-        "PageCount": "dc.format",
-        "MIMEType": "dc.format2",
-        "LayerCount": "dc.description"
-    }
-    renamed_row = {column_mapping.get(key, key): value for key, value in row.items()}
-    return renamed_row
-
-def check_and_add_columns(rows):
-    if not rows:
-        return [], rows
-    fieldnames = list(rows[0].keys())
+def export_columns(header):
+    """
+    Locate the exiftool fields used by modify_row in a metadataExp header.
+    Returns (fields, width): fields is an itemgetter yielding the values of EXPORT_FIELDNAMES from a row,
+    width is the row length needed for it. Fields missing from the header are placed past its end, so rows
+    trimmed to the header and then padded to width read them as empty strings.
+    """
+    columns = {name: i for i, name in enumerate(header)}
+    width = len(header)
+    indices = []
+    for name in EXPORT_FIELDNAMES:
+        if name not in columns:
+            columns[name] = width
+            width += 1
+        indices.append(columns[name])
+    return itemgetter(*indices), width
+
+def modify_row(row, fields):
+    """
+    Build a metadata row (filename, dc.title, dc.date, dc.format, dc.format2, dc.description)
+    from a positional metadataExp row, using the fields getter from export_columns.
+    """
+    source_file, title, file_name, create_date, page_count, extension, mime_type, layer_count = fields(row)
+    return [
+        add_data_objects_prefix(source_file),
+        file_name,
+        clean_date(create_date),
+        add_page_count_extension(page_count, extension),
+        mime_type,
+        # pass extension, Title and FileName to process_layer_count so it can produce the requested phrasing
+        process_layer_count(layer_count, extension, title, file_name),
+    ]
+
+def check_and_add_columns(fieldnames):
+    fieldnames = list(fieldnames)
     if "PageCount" not in fieldnames:
         fieldnames = fieldnames + ["PageCount"]
     if "LayerCount" not in fieldnames:
         fieldnames = fieldnames + ["LayerCount"]
     if "Title" not in fieldnames:
         fieldnames = fieldnames + ["Title"]
-    return fieldnames, rows
+    return fieldnames
 
 def add_missing_columns(input_file):
-    try:
-        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
-            rows = list(reader)
-
-        if not rows:
-            print(f"No rows found in '{input_file}'. Nothing to add.")
-            return
+    """Add any missing PageCount, LayerCount and Title columns to the CSV header.
 
-        fieldnames, _ = check_and_add_columns(rows)
-
-        with open(input_file, 'w', newline='', encoding='utf-8') as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
+    Only the header is read when no column is missing.  Otherwise rows are streamed to a sibling .tmp file,
+    which then replaces input_file.
+    """
+    tmp_file = input_file + ".tmp"
+    try:
+        with open(input_file, 'r', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as infile:
+            reader = csv.reader(infile)
+            header = next(reader, [])
+            fieldnames = check_and_add_columns(header)
+            if len(fieldnames) == len(header):
+                print(f"No missing columns in '{input_file}'.")
+                return
+
+            first_row = next(reader, None)
+            if first_row is None:
+                print(f"No rows found in '{input_file}'. Nothing to add.")
+                return
+
+            padding = [''] * (len(fieldnames) - len(header))
+
+            with open(tmp_file, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as outfile:
+                writer = csv.writer(outfile)
+                writer.writerow(fieldnames)
+                writer.writerow(first_row + padding)
+                for row in reader:
+                    writer.writerow(row + padding)
 
+        # Replace only once both files are closed (required on Windows)
+        os.replace(tmp_file, input_file)
         print(f"Added missing columns to '{input_file}'.")
     except Exception as e:
         print(f"An error occurred while adding missing columns: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 def remove_filemodify_if_both_exist(input_file):
     """If both FileCreateDate and FileModifyDate exist in the CSV header, remove the FileModifyDate column and value rows.
 
-    This rewrites the CSV in place without the FileModifyDate column.
+    Only the header is read when there is nothing to remove.  Otherwise rows are streamed without the
+    FileModifyDate column to a sibling .tmp file, which then replaces input_file.
     """
+    tmp_file = input_file + ".tmp"
     try:
-        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
-            fieldnames = reader.fieldnames or []
-            rows = list(reader)
-
-        # If both are present in the header, remove FileModifyDate from header and each row
-        if 'FileCreateDate' in fieldnames and 'FileModifyDate' in fieldnames:
-            new_fieldnames = [fn for fn in fieldnames if fn != 'FileModifyDate']
-            for row in rows:
-                row.pop('FileModifyDate', None)
-
-            with open(input_file, 'w', newline='', encoding='utf-8') as outfile:
-                writer = csv.DictWriter(outfile, fieldnames=new_fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
-
-            print(f"Removed 'FileModifyDate' from '{input_file}' because 'FileCreateDate' was present.")
-        else:
-            # Nothing to do
-            print(f"No action: 'FileCreateDate' and 'FileModifyDate' not both present in '{input_file}'.")
+        with open(input_file, 'r', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as infile:
+            reader = csv.reader(infile)
+            fieldnames = next(reader, [])
+
+            if 'FileCreateDate' not in fieldnames or 'FileModifyDate' not in fieldnames:
+                # Nothing to do
+                print(f"No action: 'FileCreateDate' and 'FileModifyDate' not both present in '{input_file}'.")
+                return
+
+            # Both are present in the header, remove FileModifyDate from header and each row
+            modify_index = fieldnames.index('FileModifyDate')
+            with open(tmp_file, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as outfile:
+                writer = csv.writer(outfile)
+                del fieldnames[modify_index]
+                writer.writerow(fieldnames)
+                for row in reader:
+                    if len(row) > modify_index:
+                        del row[modify_index]
+                    writer.writerow(row)
+
+        # Replace only once both files are closed (required on Windows)
+        os.replace(tmp_file, input_file)
+        print(f"Removed 'FileModifyDate' from '{input_file}' because 'FileCreateDate' was present.")
     except Exception as e:
         print(f"An error occurred while removing FileModifyDate: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def copy_normalized_export(reader, writer):
+    """
+    Copy exiftool CSV rows from reader to writer, dropping FileModifyDate when FileCreateDate is present and
+    adding any missing PageCount, LayerCount and Title columns (see remove_filemodify_if_both_exist and
+    add_missing_columns).
+    """
+    header = next(reader, None)
+    if header is None:
+        return
+
+    modify_index = None
+    if 'FileCreateDate' in header and 'FileModifyDate' in header:
+        modify_index = header.index('FileModifyDate')
+        del header[modify_index]
+    fieldnames = check_and_add_columns(header)
+    padding = [''] * (len(fieldnames) - len(header))
+
+    writer.writerow(fieldnames)
+    for row in reader:
+        if modify_index is not None and len(row) > modify_index:
+            del row[modify_index]
+        writer.writerow(row + padding)
 
 def process_csv(input_file, output_file):
-    try:
-        with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
-            fieldnames = reader.fieldnames
-            rows = list(reader)
-
-        modified_rows = []
-
-        for row in rows:
-            row = modify_row(row)
-            row = delete_columns(row)
-            row = rename_columns(row)
-            modified_rows.append(row)
-
-        with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-            fieldnames_mapping = {
-                "filename": "filename",  # Adjust the column name here
-                "dc.title": "dc.title",
-                "dc.date": "dc.date",
-                "dc.format": "dc.format",
-                "dc.format2": "dc.format2",
-                "dc.description": "dc.description"
-            }
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames_mapping.values())
-            writer.writeheader()
-
-            for row in modified_rows:
-                renamed_row = {fieldnames_mapping.get(key, key): value for key, value in row.items()}
-                writer.writerow(renamed_row)
+    """
+    Transform the metadataExp rows and write them to output_file in a single pass.
 
-        print(f"Processing complete. Modified data written to '{output_file}'.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    A top-level "objects" row is written first, and a folder row ("objects/<path>") is written ahead of the
+    first file of each folder.  Folder rows and rows without a dc.title have the "data/" prefix dropped, as
+    convert_metadata.py expects.  Returns a list of (filename, dc.date) for create_rights_csv, or None on error.
 
-def create_rights_csv():
+    The output is written to a sibling .tmp file and moved into place once complete, so an error never leaves
+    a partial output_file behind.
+    """
+    tmp_file = output_file + ".tmp"
     try:
-        rights_file = "rights.csv"
+        files = []
+        seen_folders = set()
+        # Stream rows straight from the export to the output instead of holding them in memory
+        with open(input_file, 'r', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as infile, \
+                open(tmp_file, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as outfile:
+            reader = csv.reader(infile)
+            writer = csv.writer(outfile)
+            header = next(reader, [])
+            fields, width = export_columns(header)
+            header_width = len(header)
+            writer.writerow(METADATA_FIELDNAMES)
+            writer.writerow(['objects', '', '', '', '', ''])
+
+            for row in reader:
+                # Cells past the end of the header belong to no column; drop them (as DictReader did)
+                # before padding, or the first would be read as a missing exiftool field
+                del row[header_width:]
+                if len(row) < width:
+                    row.extend([''] * (width - len(row)))
+                new_row = modify_row(row, fields)
+                filename = new_row[0]
+                files.append((filename, new_row[2]))
+
+                # Group on the folder part of filename, e.g. data/objects/photos
+                folder = filename.rpartition('/')[0]
+                if folder not in seen_folders:
+                    seen_folders.add(folder)
+                    # Only the leading "data/", so a source folder named "data" keeps its name
+                    writer.writerow([folder.replace('data/', '', 1), '', '', '', '', ''])
+                if not new_row[1]:  # If dc.title is blank
+                    new_row[0] = filename.replace('data/', '', 1)
+                writer.writerow(new_row)
 
-        with open("metadataTmp.csv", 'r', newline='', encoding='utf-8') as infile:
-            reader = csv.DictReader(infile)
-            rows = list(reader)
+        os.replace(tmp_file, output_file)
+        print(f"Processing complete. Modified data written to '{output_file}'.")
+        return files
+    except Exception as e:
+        if isinstance(e, UnicodeDecodeError):
+            # e.g. a file name exiftool wrote in the Windows code page rather than UTF-8
+            print(f"'{input_file}' is not valid UTF-8 ({e}). Correct the affected rows or re-save the file "
+                  "as UTF-8, then rerun and answer n.")
+        else:
+            print(f"An error occurred: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return None
 
-        # Gather user input once
+def prompt_rights_details():
+    """
+    Ask for the transfer type and document ID written to every rights.csv row, repeating each prompt until
+    the answer is valid.  Returns (doc_id_type, doc_id_value), with doc_id_type already mapped through
+    DOC_ID_TYPES.  Raises EOFError if input ends first.
+    """
+    while True:
         doc_id_type = input("Enter 'u' for University Records Transfer or 'd' for Deed of Gift: ").strip().lower()
+        if doc_id_type in DOC_ID_TYPES:
+            break
+        print(f"Unknown transfer type '{doc_id_type}', expected 'u' or 'd'.")
+    while True:
         doc_id_value = input("Enter a document ID value in the format ####-###: ").strip()
+        if DOC_ID_RE.match(doc_id_value):
+            break
+        print(f"Document ID '{doc_id_value}' does not match the format ####-###.")
+    return DOC_ID_TYPES[doc_id_type], doc_id_value
 
-        # Map doc_id_type input to the corresponding value
-        doc_id_type_mapping = {
-            "d": "Deed of Gift",
-            "u": "University Records Transfer"
-        }
-
-        with open(rights_file, 'w', newline='', encoding='utf-8') as outfile:
-            fieldnames = ["file", "basis", "status", "determination_date", "jurisdiction", "start_date", "end_date",
-                          "note", "grant_act", "grant_restriction", "grant_start_date", "grant_end_date",
-                          "grant_note", "doc_id_type", "doc_id_value", "doc_id_role"]
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for row in rows:
-                start_date = row.get("dc.date", "")
-                if start_date:
-                    start_date = start_date.split()[0]
-
-                grant_start_date = datetime.today().strftime("%Y-%m-%d")
-
-                new_row = {
-                    "file": row.get("filename", ""),
-                    "basis": "copyright",
-                    "status": "copyrighted",
-                    "determination_date": datetime.today().strftime("%Y-%m-%d"),
-                    "jurisdiction": "ca",
-                    "start_date": start_date,
-                    "end_date": f"{int(start_date[:4]) + 100}-" + start_date[5:] if start_date else "",
-                    "note": "Copyright held by creator",
-                    "grant_act": "disseminate",
-                    "grant_restriction": "Conditional",
-                    "grant_start_date": grant_start_date,
-                    "grant_end_date": f"{int(grant_start_date[:4]) + 100}-" + grant_start_date[5:],
-                    "grant_note": "May disseminate with the permission of the creator.",
-                    "doc_id_type": doc_id_type_mapping.get(doc_id_type, ""),
-                    "doc_id_value": doc_id_value,
-                    "doc_id_role": "Copyright held by creator"
-                }
-                writer.writerow(new_row)
-
+def create_rights_csv(files, doc_id_type, doc_id_value, rights_file="rights.csv"):
+    """
+    Write rights_file with one row per (filename, dc.date) pair returned by process_csv, using the answers
+    from prompt_rights_details.  Like process_csv, it writes to a sibling .tmp file first.
+    Returns True once rights_file is written, False on error.
+    """
+    tmp_file = rights_file + ".tmp"
+    try:
+        # Values shared by every row, computed once rather than per row
+        today_str = datetime.today().strftime("%Y-%m-%d")
+        grant_end_date = f"{int(today_str[:4]) + 100}-" + today_str[5:]
+
+        # Constant columns either side of start_date/end_date, in the order of RIGHTS_FIELDNAMES
+        leading_columns = ("copyright", "copyrighted", today_str, "ca")
+        trailing_columns = ("Copyright held by creator", "disseminate", "Conditional", today_str, grant_end_date,
+                            "May disseminate with the permission of the creator.", doc_id_type,
+                            doc_id_value, "Copyright held by creator")
+
+        with open(tmp_file, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(RIGHTS_FIELDNAMES)
+
+            # start_date is dc.date, already trimmed to the date part by clean_date
+            for filename, start_date in files:
+                end_date = f"{int(start_date[:4]) + 100}-" + start_date[5:] if start_date else ""
+                writer.writerow((filename, *leading_columns, start_date, end_date, *trailing_columns))
+
+        os.replace(tmp_file, rights_file)
         print(f"Rights data written to '{rights_file}'.")
+        return True
     except Exception as e:
-        print(f"An error occurred while creating rights.csv: {e}")
+        print(f"An error occurred while creating {rights_file}: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return False
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Create metadata1.csv and rights.csv from an exiftool export.")
+    parser.add_argument("--source", help="folder of files to scan with exiftool, instead of selecting it in a dialog")
+    parser.add_argument("--dest", help="folder to write metadataExp.csv to, instead of selecting it in a dialog")
+    args = parser.parse_args(argv[1:])
+
+    # The dialogs only return folders that exist; folders typed on the command line are checked here
+    for option, folder in (("--source", args.source), ("--dest", args.dest)):
+        if folder and not os.path.isdir(folder):
+            print(f"The {option} folder '{folder}' does not exist or is not a folder. Exiting.")
+            return 1
 
-if __name__ == "__main__":
     # The script can optionally run exiftool to create metadataExp.csv before continuing.
-    print("Do you want to generate metadataExp.csv by running exiftool on a folder of files? (y/n)")
-    answer = input().strip().lower()
+    # Passing either folder on the command line implies the answer is yes.
+    if args.source or args.dest:
+        answer = "y"
+    else:
+        print("Do you want to generate metadataExp.csv by running exiftool on a folder of files? (y/n)")
+        answer = input().strip().lower()
     if answer == "y":
-        print("Please select the folder that contains the files to scan with exiftool.")
-        source_folder = select_folder_dialog("Select source folder for exiftool")
+        source_folder = args.source
+        if not source_folder:
+            print("Please select the folder that contains the files to scan with exiftool.")
+            source_folder = select_folder_dialog("Select source folder for exiftool")
         if not source_folder:
             print("No source folder selected. Exiting.")
-            exit(1)
-        print("Please select the destination folder where metadataExp.csv should be created.")
-        dest_folder = select_folder_dialog("Select destination folder for metadataExp.csv")
+            return 1
+        dest_folder = args.dest
+        if not dest_folder:
+            print("Please select the destination folder where metadataExp.csv should be created.")
+            dest_folder = select_folder_dialog("Select destination folder for metadataExp.csv")
         if not dest_folder:
             print("No destination folder selected. Exiting.")
-            exit(1)
+            return 1
         try:
             generated = run_exiftool_and_create_metadataexp(dest_folder, source_folder, output_name="metadataExp.csv")
             print(f"metadataExp.csv generated at: {generated}")
         except FileNotFoundError as fnf:
             print(fnf)
             print("Cannot proceed without exiftool. Exiting.")
-            exit(1)
+            return 1
         except subprocess.CalledProcessError as cpe:
             print(f"exiftool failed: {cpe}")
-            exit(1)
-        # Use generated file as input
+            return 1
+        except (OSError, csv.Error) as e:
+            print(f"Could not write metadataExp.csv: {e}")
+            return 1
+        # Use generated file as input; its columns were already fixed up while it was written
         input_csv = os.path.join(dest_folder, "metadataExp.csv")
     else:
         input_csv = "metadataExp.csv"
         if not os.path.exists(input_csv):
             print(f"'{input_csv}' not found. You can generate it by answering 'y' when prompted next time.")
-            exit(1)
-
-    output_csv = "metadataTmp.csv"
-
-    # Add missing columns if necessary
-    add_missing_columns(input_csv)
-
-    # If both FileCreateDate and FileModifyDate exist in the exported CSV, prefer FileCreateDate and remove FileModifyDate
-    remove_filemodify_if_both_exist(input_csv)
-
-    process_csv(input_csv, output_csv)
-
-    # The second set of subroutines (kept largely as in original file)
-    def add_objects_row(rows):
-        new_row = ['objects'] + [''] * (len(rows[0]) - 1)
-        rows.insert(1, new_row)
-
-    def copy_filename_to_filename2(rows):
-        for row in rows[1:]:
-            filename = row[0]
-            last_slash_index = filename.rfind('/')
-            if last_slash_index != -1:
-                row.append(filename[:last_slash_index])
-            else:
-                row.append('')
-
-    def add_rows_above_unique_data(rows, unique_data):
-        for unique_value in set(row[-1] for row in rows[1:] if row[-1] != 'filename2'):
-            new_row = [unique_value] + [''] * (len(rows[0]) - 1)
-            for i, row in enumerate(rows):
-                if row[-1] == unique_value:
-                    rows.insert(i, new_row)
-                    break
-
-    def delete_rows_and_columns(rows):
-        # Note: original code deleted rows[1:2] # Delete rows 2 and 3 (this is effectively deleting only row index 1)
-        # We'll keep the original intent (delete second row) but guard against IndexError
-        if len(rows) > 1:
-            del rows[1:2]
-        for row in rows[1:]:
-            if len(row) > 1 and not row[1]:  # If dc.title is blank
-                row[0] = row[0].replace('data/', '')  # Delete "data/" from filename
-        for row in rows:
-            if row:
-                del row[-1]  # Delete filename2 column
-
-    def delete_first_row(rows):
-        if rows:
-            del rows[0]  # Delete the first row
-
-    def process_csv_second_stage(input_file, output_file):
-        try:
-            with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-                reader = csv.reader(infile)
-                rows = list(reader)
-                if not rows:
-                    print(f"No rows in {input_file}")
-                    return
-                fieldnames = rows[0]
-
-            add_objects_row(rows)
-            copy_filename_to_filename2(rows)
-
-            fieldnames.append('filename2')
-
-            # Determine a unique filename2 value to group on; fall back to '' if no entries
-            unique_filename2_candidates = [row[-1] for row in rows[1:] if row[-1]]
-            unique_filename2 = unique_filename2_candidates[0] if unique_filename2_candidates else ''
-            add_rows_above_unique_data(rows, unique_filename2)
-            if len(rows) > 1:
-                rows[1][0] = unique_filename2
-
-            delete_rows_and_columns(rows)
-            delete_first_row(rows)  # Deleting the first row
-
-            with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-                writer = csv.writer(outfile)
-                writer.writerows([fieldnames] + rows)
+            return 1
 
-            print(f"Processing complete. Modified data written to '{output_file}'.")
-        except Exception as e:
-            print(f"An error occurred: {e}")
+        # Add missing columns if necessary
+        add_missing_columns(input_csv)
 
-    def delete_metadata_tmp_file():
-        try:
-            if os.path.exists("metadataTmp.csv"):
-                os.remove("metadataTmp.csv")
-                print("Deleted metadataTmp.csv")
-        except Exception as e:
-            print(f"An error occurred while deleting metadataTmp.csv: {e}")
+        # If both FileCreateDate and FileModifyDate exist in the exported CSV, prefer FileCreateDate and remove FileModifyDate
+        remove_filemodify_if_both_exist(input_csv)
+
+    # Ask before writing anything, so a mistyped answer is corrected rather than ending the run
+    try:
+        doc_id_type, doc_id_value = prompt_rights_details()
+    except EOFError:
+        print("Input ended before the transfer type and document ID were entered. Exiting.")
+        return 1
 
-    input_csv = "metadataTmp.csv"
     output_csv = "metadata1.csv"
+    rights_csv = "rights.csv"
+
+    # Outputs of an earlier transfer must not survive a failed run, where convert_metadata.py (or the bag)
+    # would pick them up as if they belonged to this one
+    for stale in (output_csv, rights_csv):
+        try:
+            if os.path.exists(stale):
+                os.remove(stale)
+                print(f"Removed '{stale}' left by a previous run.")
+        except OSError as e:
+            print(f"Could not remove the previous '{stale}': {e}. Close it if it is open and rerun.")
+            return 1
 
-    process_csv_second_stage(input_csv, output_csv)
+    files = process_csv(input_csv, output_csv)
+    if files is None:
+        return 1
 
-    create_rights_csv()
+    if not create_rights_csv(files, doc_id_type, doc_id_value, rights_csv):
+        return 1
+    return 0
 
-    delete_metadata_tmp_file()
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
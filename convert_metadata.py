@@ -14,157 +14,181 @@ Behavior implemented to match the example metadata-rev.csv:
       or "MIN-MAX" if multiple years are present.
 - For data rows (typically filenames starting with "data/objects/"):
   - Ensure dc.title is the basename of the filename if empty.
-  - Normalize dc.description phrases like "Item is a ppt file relating to ..." to
-    "Item is a (ppt) file relating to ..." (wrap file extensions in parentheses if missing).
+  - dc.description is passed through as written by convert.py, which already wraps the file extension
+    in parentheses ("Item is a (ppt) file relating to ...").
+- Rows are read and written positionally and streamed; only the current group row and its children are held in memory.
 - After successful conversion, delete metadata1.csv from disk.
 """
 import csv
 import os
 import re
 import sys
-from collections import Counter
+from operator import itemgetter
 
 YEAR_RE = re.compile(r'(19\d{2}|20\d{2})')
+# Output columns, in order; any other input columns follow them
+OUT_FIELDS = ("filename", "dc.title", "dc.date", "dc.format", "dc.format2", "dc.description")
+# Positions of the OUT_FIELDS columns in an output row
+FILENAME, TITLE, DATE, FORMAT, FORMAT2, DESCRIPTION = range(len(OUT_FIELDS))
 
 def basename_from_path(path):
     if not path:
         return ""
-    return os.path.basename(path)
-
-def ensure_description_parens(desc):
-    """
-    Convert "Item is a ppt file relating to X" -> "Item is a (ppt) file relating to X"
-    Only applied when the extension is not already in parentheses.
-    """
-    if not desc:
-        return desc
-    # only process lines starting with "Item is a " (case-insensitive)
-    m = re.match(r'^(Item is a )([A-Za-z0-9]+)( file\b.*)$', desc)
-    if m:
-        ext = m.group(2)
-        tail = m.group(3)
-        return f"{m.group(1)}{ext}{tail}"
-    return desc
-
-def extract_years_from_strings(strings):
-    years = []
-    for s in strings:
-        if not s:
-            continue
-        for y in YEAR_RE.findall(s):
-            try:
-                years.append(int(y))
-            except Exception:
-                pass
-    return years
+    # filename comes from convert.py as data/objects/..., always with '/' separators
+    return path.rpartition('/')[2]
 
 def infer_group_date(child_dates):
     """
     child_dates: list of date strings (may include full dates like 2008-06-20)
     Return: inferred date:
-      - if one exact string appears more than once -> that string
+      - if one exact string appears more than once -> the most frequent one (first seen on ties)
       - else extract years; if none -> first non-empty child date
       - if one unique year -> that year
       - if multiple years -> "min-max"
     """
-    vals = [d for d in child_dates if d and d.strip()]
-    if not vals:
+    # frequency of exact strings; dict order keeps first-seen order for ties
+    counts = {}
+    for d in child_dates:
+        if d and d.strip():
+            counts[d] = counts.get(d, 0) + 1
+    if not counts:
         return ""
 
-    # frequency of exact strings
-    freq = Counter(vals)
-    most_common, count = freq.most_common(1)[0]
-    if count > 1:
+    most_common = max(counts, key=counts.get)
+    if counts[most_common] > 1:
         return most_common
 
-    years = extract_years_from_strings(vals)
-    if not years:
+    # every value is distinct here; track the year range without building a list
+    min_y = max_y = None
+    for d in counts:
+        for y in YEAR_RE.findall(d):
+            y = int(y)
+            if min_y is None or y < min_y:
+                min_y = y
+            if max_y is None or y > max_y:
+                max_y = y
+
+    if min_y is None:
         # fallback to first value
-        return vals[0]
-
-    min_y = min(years)
-    max_y = max(years)
+        return next(iter(counts))
     if min_y == max_y:
         return str(min_y)
     return f"{min_y}-{max_y}"
 
-def convert(infile, outfile):
-    # read
-    with open(infile, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames or ["filename","dc.title","dc.date","dc.format","dc.format2","dc.description"]
-        rows = [dict(r) for r in reader]
-
-    # Remove first occurrence where filename == 'objects'
-    removed = False
-    new_rows = []
-    for r in rows:
-        fn = (r.get('filename') or "").strip()
-        if not removed and fn == 'objects':
-            removed = True
-            continue
-        new_rows.append(r)
-    rows = new_rows
-
-    # Find indices of group rows (filename startswith 'objects/')
-    group_indices = []
-    for idx, r in enumerate(rows):
-        fn = (r.get('filename') or "")
-        if fn.startswith("objects/"):
-            group_indices.append(idx)
-
-    # For each group row, infer date from children and populate fields
-    for i, grp_idx in enumerate(group_indices):
-        start = grp_idx
-        end = group_indices[i+1] if (i+1) < len(group_indices) else len(rows)
-        # children are rows start+1 .. end-1
-        child_dates = []
-        for j in range(start+1, end):
-            child = rows[j]
-            # skip rows that are themselves group rows (shouldn't be here because end stops there)
-            child_dates.append((child.get('dc.date') or "").strip())
-
-        inferred = infer_group_date(child_dates)
-        # populate dc.title, dc.format (if blank), dc.description, dc.date (if inferred)
-        r = rows[grp_idx]
-        fname = (r.get('filename') or "")
-        last_seg = fname.rsplit('/', 1)[-1] if fname else ""
-        # set title
-        r['dc.title'] = last_seg
-        # set date if inferred and not empty
-        if inferred:
-            r['dc.date'] = inferred
-        # set format if blank
-        if not (r.get('dc.format') and str(r.get('dc.format')).strip()):
-            r['dc.format'] = "1 digital folder"
-        # set description
-        r['dc.description'] = f"Folder contains files relating to {last_seg}"
-
-    # Additional normalization for data rows:
-    for r in rows:
-        fn = (r.get('filename') or "")
-        if fn.startswith("data/objects/"):
-            # ensure dc.title is basename
-            if not (r.get('dc.title') and r.get('dc.title').strip()):
-                r['dc.title'] = basename_from_path(fn)
-            # normalize dc.description to put extension in parentheses
-            r['dc.description'] = ensure_description_parens(r.get('dc.description') or "")
-
+def fill_group_row(r, child_dates):
+    """
+    Populate a group row (filename startswith 'objects/') from the dc.date values of the rows
+    between it and the next group row.
+    """
+    inferred = infer_group_date(child_dates)
+    last_seg = r[FILENAME].rsplit('/', 1)[-1]
+    # set title
+    r[TITLE] = last_seg
+    # set date if inferred and not empty
+    if inferred:
+        r[DATE] = inferred
+    # set format if blank
+    if not r[FORMAT].strip():
+        r[FORMAT] = "1 digital folder"
+    # set description
+    r[DESCRIPTION] = f"Folder contains files relating to {last_seg}"
+
+def output_columns(fieldnames):
+    """
+    Map an input header onto the output columns: OUT_FIELDS first, then any other input columns in
+    their input order.  Returns (out_fields, project, width), where project(row) returns a row's values in
+    out_fields order once the row is padded to width.
+    """
     # Ensure header ordering matches desired output
-    out_fields = ["filename","dc.title","dc.date","dc.format","dc.format2","dc.description"]
+    out_fields = list(OUT_FIELDS)
     # Add any missing fields at end
-    for f in fieldnames:
-        if f not in out_fields:
-            out_fields.append(f)
-
-    # write
-    with open(outfile, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=out_fields)
-        writer.writeheader()
-        for r in rows:
-            # ensure all keys present
-            out = {k: (r.get(k) or "") for k in out_fields}
-            writer.writerow(out)
+    for fld in fieldnames:
+        if fld not in out_fields:
+            out_fields.append(fld)
+
+    # A hand-edited metadata1.csv may have lost one of OUT_FIELDS; give such a column an index beyond
+    # the input row, so padding fills it with blanks instead of it shifting the other columns
+    columns = {name: i for i, name in enumerate(fieldnames)}
+    width = len(fieldnames)
+    indices = []
+    for fld in out_fields:
+        if fld not in columns:
+            columns[fld] = width
+            width += 1
+        indices.append(columns[fld])
+    return out_fields, itemgetter(*indices), width
+
+def convert(infile, outfile):
+    """
+    Stream infile to outfile.  Rows are written as they are read, except that a group row and
+    the rows that follow it are held back until the next group row (or the end of the file),
+    since the group's date is inferred from its children.
+
+    The output is written to a sibling .tmp file and moved into place once complete, so an error never
+    leaves a partial outfile behind, and outfile may be the same file as infile.
+    """
+    tmp_file = outfile + ".tmp"
+    try:
+        with open(infile, newline='', encoding='utf-8') as f, \
+                open(tmp_file, 'w', newline='', encoding='utf-8') as out:
+            reader = csv.reader(f)
+            fieldnames = next(reader, None) or OUT_FIELDS
+            out_fields, project, width = output_columns(fieldnames)
+            header_width = len(fieldnames)
+
+            writer = csv.writer(out)
+            writer.writerow(out_fields)
+
+            removed = False
+            group = []  # current group row followed by its children
+            child_dates = []  # dc.date of each child in group, gathered as they are read
+            for row in reader:
+                if not row:
+                    continue
+                # Cells past the end of the header belong to no column; drop them (as DictReader did)
+                # before padding, or the first would be read as a missing OUT_FIELDS column
+                del row[header_width:]
+                if len(row) < width:
+                    row.extend([''] * (width - len(row)))
+                r = list(project(row))
+                fn = r[FILENAME]
+
+                # Remove first occurrence where filename == 'objects'
+                if not removed and fn.strip() == 'objects':
+                    removed = True
+                    continue
+
+                if fn.startswith("objects/"):
+                    # A new group row closes the previous group
+                    if group:
+                        fill_group_row(group[0], child_dates)
+                        writer.writerows(group)
+                    group = [r]
+                    child_dates = []
+                    continue
+
+                # Additional normalization for data rows:
+                if fn.startswith("data/objects/"):
+                    # ensure dc.title is basename
+                    if not r[TITLE].strip():
+                        r[TITLE] = basename_from_path(fn)
+
+                if group:
+                    group.append(r)
+                    child_dates.append(r[DATE].strip())
+                else:
+                    writer.writerow(r)
+
+            if group:
+                fill_group_row(group[0], child_dates)
+                writer.writerows(group)
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    # Replace only once both files are closed (required on Windows); infile may be outfile
+    os.replace(tmp_file, outfile)
 
 def main(argv):
     # Prefer metadata1.csv in current directory if present